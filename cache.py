@@ -0,0 +1,184 @@
+"""
+cache.py - Persistent on-disk cache for AI enhancement results.
+
+Product titles repeat heavily across scrapes, so LLM answers are stored as
+JSON under ~/.cache/instapermit (override with INSTAPERMIT_CACHE_DIR) and
+reused instead of asking the model again. Lookups match exact keys first,
+then near-duplicate titles by cosine similarity of character-trigram vectors.
+An inverted trigram index narrows each similarity search to the few cached
+keys that share a rare trigram with the query, and each store keeps only its
+MAX_ENTRIES most recently written keys.
+"""
+
+import json
+import math
+import os
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("INSTAPERMIT_CACHE_DIR") or Path.home() / ".cache" / "instapermit")
+SIMILARITY_THRESHOLD = 0.92
+MAX_ENTRIES = 5000
+
+_lock = threading.Lock()
+_stores: dict[str, dict[str, str]] = {}
+# Per-store trigram vectors of cached keys and trigram -> keys postings,
+# built lazily for similarity search and kept in step with evictions
+_vectors: dict[str, dict[str, tuple[Counter, float]]] = {}
+_index: dict[str, dict[str, set[str]]] = {}
+
+
+def _path(name: str) -> Path:
+    return CACHE_DIR / f"{name}.json"
+
+
+def load(name: str) -> dict[str, str]:
+    """Return the named cache, reading it from disk on first use."""
+    with _lock:
+        if name not in _stores:
+            try:
+                _stores[name] = json.loads(_path(name).read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                _stores[name] = {}
+        return _stores[name]
+
+
+def update(name: str, entries: dict[str, str]) -> None:
+    """Merge entries into the named cache and persist it atomically."""
+    if not entries:
+        return
+    store = load(name)
+
+    with _lock:
+        # Re-inserting moves a key to the end, so the oldest writes are evicted first
+        for key, value in entries.items():
+            store.pop(key, None)
+            store[key] = value
+        for key in list(store)[: max(len(store) - MAX_ENTRIES, 0)]:
+            del store[key]
+            _unindex(name, key)
+        _save(name, store)
+
+
+def remove(name: str, keys: list[str]) -> None:
+    """Delete keys from the named cache and persist it atomically."""
+    store = load(name)
+
+    with _lock:
+        dropped = [key for key in keys if store.pop(key, None) is not None]
+        for key in dropped:
+            _unindex(name, key)
+        if dropped:
+            _save(name, store)
+
+
+def _save(name: str, store: dict[str, str]) -> None:
+    """Write a store to disk via a temp file and os.replace (caller holds _lock)."""
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(store, f)
+        os.replace(tmp, _path(name))
+    except OSError as exc:
+        print(f"[WARNING] Could not write cache '{name}': {exc}")
+
+
+def _embed(text: str) -> tuple[Counter, float]:
+    """Character-trigram count vector of the normalized text, plus its L2 norm."""
+    padded = f"  {' '.join(text.lower().split())} "
+    vec = Counter(padded[i : i + 3] for i in range(len(padded) - 2))
+    return vec, math.sqrt(sum(n * n for n in vec.values()))
+
+
+def similarity(a: str, b: str) -> float:
+    """Cosine similarity of two strings' trigram vectors (1.0 = identical)."""
+    (va, na), (vb, nb) = _embed(a), _embed(b)
+    if not na or not nb:
+        return 0.0
+    return sum(n * vb[g] for g, n in va.items()) / (na * nb)
+
+
+def _unindex(name: str, key: str) -> None:
+    """Drop an evicted key from the store's vectors and postings (caller holds _lock)."""
+    entry = _vectors.get(name, {}).pop(key, None)
+    if entry is None:
+        return
+    postings = _index[name]
+    for gram in entry[0]:
+        postings[gram].discard(key)
+        if not postings[gram]:
+            del postings[gram]
+
+
+def _candidates(name: str, store: dict[str, str], vec: Counter, threshold: float) -> set[str]:
+    """
+    Cached keys that can reach `threshold` against `vec` (caller holds _lock).
+    Two trigram sets with cosine >= t overlap in at least t**2 of the query's trigrams,
+    so a match must contain one of the rarest len - ceil(t**2 * len) + 1 of them;
+    only those postings are read, and keys of very different length are skipped.
+    """
+    vectors = _vectors.setdefault(name, {})
+    postings = _index.setdefault(name, {})
+    for cached in store.keys() - vectors.keys():
+        vectors[cached] = _embed(cached)
+        for gram in vectors[cached][0]:
+            postings.setdefault(gram, set()).add(cached)
+
+    size = len(vec)
+    min_overlap = math.ceil(threshold * threshold * size)
+    rarest = sorted(vec, key=lambda gram: len(postings.get(gram, ())))
+    found = set().union(*(postings.get(gram, ()) for gram in rarest[: size - min_overlap + 1]))
+    grams = vec.keys()
+    return {
+        cached
+        for cached in found
+        if min_overlap <= len(vectors[cached][0]) <= size / (threshold * threshold)
+        and len(grams & vectors[cached][0].keys()) >= min_overlap
+    }
+
+
+def lookup(name: str, key: str, threshold: float = SIMILARITY_THRESHOLD) -> str | None:
+    """Return the cached value for `key`, or for its most similar cached key."""
+    store = load(name)
+    if key in store:
+        return store[key]
+
+    vec, norm = _embed(key)
+    if not norm:
+        return None
+
+    with _lock:
+        candidates = [
+            (cached, _vectors[name][cached]) for cached in _candidates(name, store, vec, threshold)
+        ]
+
+    best, best_score = None, threshold
+    for cached, (cvec, cnorm) in candidates:
+        score = sum(n * cvec[g] for g, n in vec.items()) / (norm * cnorm)
+        if score >= best_score:
+            best, best_score = cached, score
+    return store.get(best) if best is not None else None
+
+
+def split_exact(name: str, keys: list[str]) -> tuple[dict[int, str], list[int]]:
+    """Partition `keys` into exact cache hits ({index: value}) and the indices still to compute."""
+    store = load(name)
+    hits = {i: store[key] for i, key in enumerate(keys) if key in store}
+    return hits, [i for i in range(len(keys)) if i not in hits]
+
+
+def split_by_similarity(
+    name: str, keys: list[str], threshold: float = SIMILARITY_THRESHOLD
+) -> tuple[dict[int, str], list[int]]:
+    """Partition `keys` into cache hits ({index: value}) and the indices still to compute."""
+    hits, misses = {}, []
+    for i, key in enumerate(keys):
+        value = lookup(name, key, threshold)
+        if value is None:
+            misses.append(i)
+        else:
+            hits[i] = value
+    return hits, misses
@@ -8,48 +8,122 @@ Takes scraped product data and enriches it with:
      to suggest a corrected one based on a page HTML snippet.
 """
 
+import hashlib
 import json
+import operator
 import os
+import random
+import re
+import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from itertools import repeat
 
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import cache
+from fastjson import orjson
 
 load_dotenv()
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5.2")
-OPENAI_URL = "https://api.openai.com/v1/responses"
-
-
-def _chat(system: str, user: str, max_tokens: int = 300) -> str:
-    """Send a request to the OpenAI Responses API."""
+# Sentiment is templated from the rating locally unless prose from the LLM is requested
+USE_LLM_SENTIMENT = os.getenv("USE_LLM_SENTIMENT") == "1"
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+OPENAI_URL = f"{OPENAI_BASE_URL}/responses"
+
+# Long product lists are split into shards of this size and sent concurrently,
+# keeping each response well under max_output_tokens.
+SHARD_SIZE = 20
+MAX_CONCURRENCY = 4
+
+# max_output_tokens scales with shard size: (base, per product), clamped to these bounds.
+# Too small truncates the JSON (every item defaults); too large only delays the stop.
+_MIN_OUTPUT_TOKENS = 16
+_MAX_OUTPUT_TOKENS = 4096
+_CATEGORIZE_TOKENS = (20, 8)
+_SUMMARIZE_TOKENS = (50, 40)
+_FUSED_TOKENS = (30, 50)
+
+CATEGORIES = ("budget", "gaming", "professional", "general")
+DEFAULT_CATEGORY = "general"
+DEFAULT_SENTIMENT = "No sentiment available."
+
+# Persistent caches (see cache.py): title -> category, and exact
+# (title, rating) -> sentiment since the same title may be rated differently
+CATEGORY_CACHE = "categories"
+SENTIMENT_CACHE = "sentiments"
+SELECTOR_CACHE = "selectors"
+
+# One pooled session so every call after the first reuses a kept-alive TLS
+# connection to api.openai.com instead of handshaking again. The pool holds one
+# connection per concurrent shard and blocks rather than opening (and then
+# discarding) extras, so parallel shards share a fixed set of warm connections.
+# The adapter only retries connection errors; 429/5xx responses are retried in
+# _chat and _batch_get, which can honor OpenAI's rate-limit headers.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=MAX_CONCURRENCY,
+        pool_block=True,
+        max_retries=Retry(total=3, backoff_factor=0.3, allowed_methods=["POST"]),
+    ),
+)
+
+MAX_ATTEMPTS = 5
+_BACKOFF_BASE = 0.5
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Monotonic deadline set when OpenAI reports zero remaining requests.
+_paused_until = 0.0
+
+
+def _dumps(obj: object) -> str:
+    return orjson.dumps(obj).decode() if orjson else json.dumps(obj)
+
+
+def _dumpb(obj: object) -> bytes:
+    return orjson.dumps(obj) if orjson else json.dumps(obj).encode()
+
+
+def _loads(raw: str | bytes) -> object:
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either
+    return orjson.loads(raw) if orjson else json.loads(raw)
+
+
+def _auth_headers() -> dict[str, str]:
     if not OPENAI_API_KEY:
         raise EnvironmentError(
             "OPENAI_API_KEY is not set. Export it or pass it in your environment."
         )
+    return {"Authorization": f"Bearer {OPENAI_API_KEY}"}
 
-    resp = requests.post(
-        OPENAI_URL,
-        headers={
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": OPENAI_MODEL,
-            "input": [
-                {"role": "developer", "content": system},
-                {"role": "user", "content": user},
-            ],
-            "max_output_tokens": max_tokens,
-            "temperature": 0.3,
-            "text": {"format": {"type": "json_object"}},
-        },
-        timeout=30,
-    )
-    resp.raise_for_status()
-    data = resp.json()
 
-    # Extract text from Responses API: output[0].content[0].text
+def _request_body(system: str, user: str, max_tokens: int) -> dict:
+    """Responses API request body shared by live calls and Batch API lines."""
+    return {
+        "model": OPENAI_MODEL,
+        "input": [
+            {"role": "developer", "content": system},
+            {"role": "user", "content": user},
+        ],
+        "max_output_tokens": max_tokens,
+        "temperature": 0.3,
+        "text": {"format": {"type": "json_object"}},
+    }
+
+
+def _output_text(data: dict) -> str:
+    """Extract text from a Responses API object: output[0].content[0].text"""
     try:
         content = data["output"][0]["content"][0]["text"]
     except (KeyError, IndexError, TypeError):
@@ -58,111 +132,678 @@ def _chat(system: str, user: str, max_tokens: int = 300) -> str:
     return content.strip()
 
 
-# ── Enhancement 1: Category classification ──────────────────────────────────
+def _chat(system: str, user: str, max_tokens: int = 300) -> str:
+    """Send a request to the OpenAI Responses API."""
+    headers = {**_auth_headers(), "Content-Type": "application/json"}
+
+    for attempt in range(MAX_ATTEMPTS):
+        _wait_for_rate_limit()
+        resp = _SESSION.post(
+            OPENAI_URL,
+            headers=headers,
+            data=_dumpb(_request_body(system, user, max_tokens)),
+            timeout=30,
+        )
+        _track_rate_limit(resp)
 
+        retryable = resp.status_code == 429 or resp.status_code >= 500
+        if not retryable or attempt == MAX_ATTEMPTS - 1:
+            break
+        time.sleep(_retry_delay(resp, attempt))
 
-def categorize_products(products: list[dict]) -> list[dict]:
-    """Add an 'ai_category' field to each product using AI classification."""
-    titles = [p["title"] for p in products]
+    resp.raise_for_status()
+    return _output_text(_loads(resp.content))
 
-    system = (
-        "You are a product classifier. For each product title, assign exactly one "
-        "category from: budget, gaming, professional, general. "
-        'Respond with a JSON object: {"categories": ["cat1", "cat2", ...]} '
-        "one category per title, same order."
+
+def _parse_duration(value: str | None) -> float | None:
+    """Parse a header duration: plain seconds ("2") or OpenAI style ("20ms", "6m0s")."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+
+def _backoff(attempt: int) -> float:
+    return _BACKOFF_BASE * 2**attempt + random.uniform(0, _BACKOFF_BASE)
+
+
+def _retry_delay(resp: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's hint or jittered exponential backoff."""
+    header_wait = (
+        _parse_duration(resp.headers.get("Retry-After"))
+        or _parse_duration(resp.headers.get("x-ratelimit-reset-requests"))
+        or 0.0
     )
-    user = json.dumps(titles)
+    return max(header_wait, _backoff(attempt))
+
+
+def _track_rate_limit(resp: requests.Response) -> None:
+    """Pause further requests until the window resets once the request budget hits zero."""
+    global _paused_until
+    if resp.headers.get("x-ratelimit-remaining-requests") != "0":
+        return
+    reset = _parse_duration(resp.headers.get("x-ratelimit-reset-requests"))
+    if reset:
+        _paused_until = max(_paused_until, time.monotonic() + reset)
+
+
+def _wait_for_rate_limit() -> None:
+    remaining = _paused_until - time.monotonic()
+    if remaining > 0:
+        time.sleep(remaining)
+
+
+def _chunks(items: list, size: int) -> Iterator[list]:
+    """Yield consecutive slices of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _map_shards(fn: Callable[[list], list], items: list, failed: object = None) -> list:
+    """
+    Apply `fn` to SHARD_SIZE slices of `items` concurrently; results keep input order.
+    A shard whose request fails yields `failed` per item, so the other shards (and
+    anything the caller resolved locally) still apply even if every request failed.
+    """
+    shards = list(_chunks(items, SHARD_SIZE))
+    errors: list[Exception] = []
+
+    def run(shard: list) -> list:
+        try:
+            return fn(shard)
+        except Exception as exc:
+            errors.append(exc)
+            return [failed] * len(shard)
+
+    if len(shards) <= 1:
+        results = [run(shard) for shard in shards]
+    else:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENCY, len(shards))) as pool:
+            results = list(pool.map(run, shards))
+
+    if errors:
+        print(f"[WARNING] {len(errors)} of {len(shards)} AI requests failed: {errors[0]}")
+    return [x for result in results for x in result]
+
 
-    raw = _chat(system, user)
+def _token_budget(n: int, base: int, per_item: int) -> int:
+    """max_output_tokens for a reply covering `n` products."""
+    return min(max(base + per_item * n, _MIN_OUTPUT_TOKENS), _MAX_OUTPUT_TOKENS)
 
+
+def _fit(values: list, n: int, default: object) -> list:
+    """Pad or trim a shard's results to `n` items so later shards stay aligned."""
+    return (list(values) + [default] * n)[:n]
+
+
+def _assign(products: list[dict], key: str, values: Iterable) -> None:
+    """Set `key` on each product from `values` in order; the loop runs in C via map()."""
+    deque(map(operator.setitem, products, repeat(key), values), maxlen=0)
+
+
+def _indexed(found: dict[int, str], n: int, default: str) -> Iterator[str]:
+    """`found[i]` for i in range(n), or `default` where index i is missing."""
+    return map(found.get, range(n), repeat(default))
+
+
+def _answer(value: object) -> str | None:
+    """A usable model answer, or None so the caller applies (and doesn't cache) a default."""
+    return value if isinstance(value, str) and value.strip() else None
+
+
+def _category(value: object) -> str | None:
+    """A known category label, or None so an invented one is neither applied nor cached."""
+    label = value.strip().lower() if isinstance(value, str) else None
+    return label if label in CATEGORIES else None
+
+
+def _rating_entry(product: dict) -> dict:
+    return {"title": product["title"], "rating": product.get("rating")}
+
+
+def _sentiment_key(product: dict) -> str:
+    # Always stdlib json: persisted keys must not change with the optional orjson install
+    return json.dumps([product["title"], product.get("rating")])
+
+
+# ── Enhancement 1: Category classification ──────────────────────────────────
+
+# Titles that name their category outright are classified locally, no LLM needed.
+# First match wins, so "budget gaming laptop" is gaming.
+_CATEGORY_RULES = [
+    (re.compile(r"\b(gaming|gamer|rgb|rtx)\b", re.IGNORECASE), "gaming"),
+    (re.compile(r"\b(workstation|xeon|thinkpad|precision)\b", re.IGNORECASE), "professional"),
+    (re.compile(r"\b(budget|cheap|value|basic)\b", re.IGNORECASE), "budget"),
+]
+
+
+def _rule_category(title: str) -> str | None:
+    for pattern, category in _CATEGORY_RULES:
+        if pattern.search(title):
+            return category
+    return None
+
+
+def _known_categories(titles: list[str]) -> tuple[dict[int, str], list[int]]:
+    """Categories resolvable without the LLM (keyword rules, then the cache), and the rest."""
+    known = {i: cat for i, title in enumerate(titles) if (cat := _rule_category(title))}
+    rest = [i for i in range(len(titles)) if i not in known]
+
+    hits, misses = cache.split_by_similarity(CATEGORY_CACHE, [titles[i] for i in rest])
+    known.update((rest[j], cat) for j, cat in hits.items())
+    return known, [rest[j] for j in misses]
+
+
+_CATEGORIZE_SYSTEM = (
+    "You are a product classifier. For each product title, assign exactly one "
+    "category from: budget, gaming, professional, general. "
+    'Respond with a JSON object: {"categories": ["cat1", "cat2", ...]} '
+    "one category per title, same order."
+)
+
+
+def _parse_categories(raw: str, n: int) -> list[str | None]:
     try:
-        categories = json.loads(raw)["categories"]
+        categories = _loads(raw)["categories"]
     except (json.JSONDecodeError, KeyError):
-        categories = ["general"] * len(products)
+        categories = []
+
+    return [_category(cat) for cat in _fit(categories, n, None)]
+
+
+def _categorize_shard(titles: list[str]) -> list[str | None]:
+    raw = _chat(
+        _CATEGORIZE_SYSTEM,
+        _dumps(titles),
+        max_tokens=_token_budget(len(titles), *_CATEGORIZE_TOKENS),
+    )
+    return _parse_categories(raw, len(titles))
+
 
-    for product, cat in zip(products, categories):
-        product["ai_category"] = cat
+def _apply_categories(
+    products: list[dict], categories: dict[int, str], misses: list[int], fresh: list[str | None]
+) -> None:
+    new_categories = {}
+    for i, cat in zip(misses, fresh):
+        if cat:
+            categories[i] = new_categories[products[i]["title"]] = cat
 
+    _assign(products, "ai_category", _indexed(categories, len(products), DEFAULT_CATEGORY))
+    cache.update(CATEGORY_CACHE, new_categories)
+
+
+def categorize_products(products: list[dict]) -> list[dict]:
+    """
+    Add an 'ai_category' field to each product using AI classification.
+    Titles matched by a keyword rule or already cached (including near-duplicates
+    of a cached title) skip the LLM.
+    """
+    titles = [p["title"] for p in products]
+    categories, misses = _known_categories(titles)
+
+    fresh = _map_shards(_categorize_shard, [titles[i] for i in misses])
+    _apply_categories(products, categories, misses, fresh)
     return products
 
 
 # ── Enhancement 2: Rating sentiment summary ─────────────────────────────────
 
 
-def summarize_ratings(products: list[dict]) -> list[dict]:
-    """Add an 'ai_sentiment' one-liner based on each product's rating + title."""
-    entries = [{"title": p["title"], "rating": p.get("rating")} for p in products]
-
+def _summarize_shard(entries: list[dict]) -> list[str | None]:
     system = (
         "For each product, generate a concise one-sentence sentiment summary "
         "based on its rating (out of 5) and title. "
         'Respond with a JSON object: {"sentiments": ["sentence1", "sentence2", ...]} '
         "one per product, same order."
     )
-    user = json.dumps(entries)
+    raw = _chat(system, _dumps(entries), max_tokens=_token_budget(len(entries), *_SUMMARIZE_TOKENS))
+
+    try:
+        sentiments = _loads(raw)["sentiments"]
+    except (json.JSONDecodeError, KeyError):
+        sentiments = []
+
+    return [_answer(sent) for sent in _fit(sentiments, len(entries), None)]
+
+
+_SENTIMENT_BANDS = [
+    (4.5, "Excellent"),
+    (4.0, "Very good"),
+    (3.0, "Mixed"),
+    (2.0, "Below-average"),
+    (0.0, "Poor"),
+]
+
+
+def _sentiment_template(title: str, rating: float | None) -> str:
+    if rating is None:
+        return DEFAULT_SENTIMENT
+    label = next(label for floor, label in _SENTIMENT_BANDS if rating >= floor)
+    return f"{label} reviews: {title} is rated {rating:.1f} out of 5."
+
+
+def summarize_ratings(products: list[dict]) -> list[dict]:
+    """
+    Add an 'ai_sentiment' one-liner based on each product's rating + title.
+    Templated locally from the rating; with USE_LLM_SENTIMENT=1 the LLM writes
+    it instead, and exact (title, rating) pairs seen before come from the cache.
+    """
+    if not USE_LLM_SENTIMENT:
+        sentiments = [_sentiment_template(p["title"], p.get("rating")) for p in products]
+        _assign(products, "ai_sentiment", sentiments)
+        return products
+
+    keys = [_sentiment_key(p) for p in products]
+    sentiments, misses = cache.split_exact(SENTIMENT_CACHE, keys)
+
+    fresh = _map_shards(_summarize_shard, [_rating_entry(products[i]) for i in misses])
+    sentiments.update((i, sent) for i, sent in zip(misses, fresh) if sent)
+    cache.update(SENTIMENT_CACHE, {keys[i]: sent for i, sent in zip(misses, fresh) if sent})
+
+    _assign(products, "ai_sentiment", _indexed(sentiments, len(products), DEFAULT_SENTIMENT))
+    return products
+
+
+# ── Enhancements 1 + 2 fused into one request ───────────────────────────────
+
+
+_FUSED_SYSTEM = (
+    "You are a product analyst. For each product, assign exactly one category from: "
+    "budget, gaming, professional, general, and write a concise one-sentence sentiment "
+    "summary based on its rating (out of 5) and title. "
+    'Respond with a JSON object: {"items": [{"category": "cat", "sentiment": "sentence"}, '
+    "...]} one item per product, same order."
+)
 
-    raw = _chat(system, user, max_tokens=500)
 
+def _parse_fused(raw: str, n: int) -> list[tuple[str | None, str | None]]:
     try:
-        sentiments = json.loads(raw)["sentiments"]
+        items = _loads(raw)["items"]
     except (json.JSONDecodeError, KeyError):
-        sentiments = ["No sentiment available."] * len(products)
+        items = []
+
+    return [
+        (_category(item.get("category")), _answer(item.get("sentiment")))
+        if isinstance(item, dict)
+        else (None, None)
+        for item in _fit(items, n, None)
+    ]
+
+
+def _split_known(products: list[dict]) -> tuple[dict[int, str], dict[int, str], list[int]]:
+    """Categories and sentiments resolvable without the LLM, and the indices still to ask."""
+    categories, _ = _known_categories([p["title"] for p in products])
+    sentiments, _ = cache.split_exact(SENTIMENT_CACHE, [_sentiment_key(p) for p in products])
+    misses = [i for i in range(len(products)) if i not in categories or i not in sentiments]
+    return categories, sentiments, misses
+
+
+def _apply_fused(
+    products: list[dict],
+    categories: dict[int, str],
+    sentiments: dict[int, str],
+    misses: list[int],
+    fresh: list[tuple[str | None, str | None]],
+) -> None:
+    # Locally known fields win over the model's answer for the same product
+    new_categories, new_sentiments = {}, {}
+    for i, (cat, sent) in zip(misses, fresh):
+        if cat and i not in categories:
+            categories[i] = new_categories[products[i]["title"]] = cat
+        if sent and i not in sentiments:
+            sentiments[i] = new_sentiments[_sentiment_key(products[i])] = sent
+
+    # A malformed item only defaults the field it is missing
+    _assign(products, "ai_category", _indexed(categories, len(products), DEFAULT_CATEGORY))
+    _assign(products, "ai_sentiment", _indexed(sentiments, len(products), DEFAULT_SENTIMENT))
+
+    cache.update(CATEGORY_CACHE, new_categories)
+    cache.update(SENTIMENT_CACHE, new_sentiments)
+
+
+def _enhance_shard(entries: list[dict]) -> list[tuple[str | None, str | None]]:
+    raw = _chat(
+        _FUSED_SYSTEM, _dumps(entries), max_tokens=_token_budget(len(entries), *_FUSED_TOKENS)
+    )
+    return _parse_fused(raw, len(entries))
+
+
+def enhance_products_fused(products: list[dict]) -> list[dict]:
+    """
+    Add both 'ai_category' and 'ai_sentiment' with one request per shard.
+    The system prompt and product list are sent once instead of twice, and
+    products whose category and sentiment are both known locally are not sent at all.
+    """
+    categories, sentiments, misses = _split_known(products)
+    fresh = _map_shards(
+        _enhance_shard, [_rating_entry(products[i]) for i in misses], failed=(None, None)
+    )
+    _apply_fused(products, categories, sentiments, misses, fresh)
+    return products
+
+
+# ── Batch API (non-interactive bulk runs) ───────────────────────────────────
+
+BATCH_POLL_SECONDS = 30
+_BATCH_TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+def _submit_batch(lines: list[dict]) -> str:
+    """Upload request lines as a JSONL file and start a batch; returns the batch id."""
+    jsonl = b"\n".join(_dumpb(line) for line in lines)
+    resp = _SESSION.post(
+        f"{OPENAI_BASE_URL}/files",
+        headers=_auth_headers(),
+        files={"file": ("batch.jsonl", jsonl, "application/jsonl")},
+        data={"purpose": "batch"},
+        timeout=60,
+    )
+    resp.raise_for_status()
+
+    resp = _SESSION.post(
+        f"{OPENAI_BASE_URL}/batches",
+        headers=_auth_headers(),
+        json={
+            "input_file_id": resp.json()["id"],
+            "endpoint": "/v1/responses",
+            "completion_window": "24h",
+        },
+        timeout=30,
+    )
+    resp.raise_for_status()
+    return resp.json()["id"]
 
-    for product, sent in zip(products, sentiments):
-        product["ai_sentiment"] = sent
 
+def _batch_get(url: str, timeout: int) -> requests.Response:
+    """
+    GET for the batch poll/download loop. The adapter retries neither GET read errors
+    nor 429/5xx, and one blip must not abandon a batch that keeps running server-side.
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        last = attempt == MAX_ATTEMPTS - 1
+        try:
+            resp = _SESSION.get(url, headers=_auth_headers(), timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if last:
+                raise
+            time.sleep(_backoff(attempt))
+            continue
+
+        retryable = resp.status_code == 429 or resp.status_code >= 500
+        if not retryable or last:
+            break
+        time.sleep(_retry_delay(resp, attempt))
+
+    resp.raise_for_status()
+    return resp
+
+
+def _wait_for_batch(batch_id: str) -> dict:
+    """Poll a batch until it reaches a terminal status; returns the batch object."""
+    while True:
+        batch = _batch_get(f"{OPENAI_BASE_URL}/batches/{batch_id}", timeout=30).json()
+        if batch["status"] in _BATCH_TERMINAL:
+            return batch
+        time.sleep(BATCH_POLL_SECONDS)
+
+
+def _download_batch(file_id: str) -> dict[str, str]:
+    """Fetch a batch output file and map each custom_id to its response text."""
+    resp = _batch_get(f"{OPENAI_BASE_URL}/files/{file_id}/content", timeout=60)
+
+    outputs = {}
+    for line in resp.text.splitlines():
+        if not line.strip():
+            continue
+        result = _loads(line)
+        response = result.get("response") or {}
+        if response.get("status_code") == 200:
+            outputs[result["custom_id"]] = _output_text(response["body"])
+    return outputs
+
+
+def _batch_texts(system: str, payloads: list[str], max_tokens: list[int]) -> list[str]:
+    """Run one request per user payload through the Batch API; "" where a request failed."""
+    if not payloads:
+        return []
+
+    lines = [
+        {
+            "custom_id": str(i),
+            "method": "POST",
+            "url": "/v1/responses",
+            "body": _request_body(system, payload, budget),
+        }
+        for i, (payload, budget) in enumerate(zip(payloads, max_tokens))
+    ]
+
+    # Like a failed live shard, a failed batch only defaults the products it was asked about
+    try:
+        outputs = _run_batch(lines)
+    except Exception as exc:
+        print(f"[WARNING] OpenAI batch failed: {exc}")
+        outputs = {}
+    return [outputs.get(str(i), "") for i in range(len(payloads))]
+
+
+def _run_batch(lines: list[dict]) -> dict[str, str]:
+    """Submit, poll and download one batch; maps each custom_id to its response text."""
+    batch_id = _submit_batch(lines)
+    print(f"Submitted OpenAI batch {batch_id}; polling every {BATCH_POLL_SECONDS}s...")
+    try:
+        batch = _wait_for_batch(batch_id)
+        if batch["status"] != "completed":
+            raise RuntimeError(f"Batch {batch_id} ended with status '{batch['status']}'")
+
+        # Requests that errored inside the batch have no output and fall back to defaults
+        output_file_id = batch.get("output_file_id")
+        return _download_batch(output_file_id) if output_file_id else {}
+    except requests.RequestException:
+        print(
+            f"[WARNING] Lost contact with OpenAI batch {batch_id}; its results can be "
+            f"fetched later from {OPENAI_BASE_URL}/batches/{batch_id}"
+        )
+        raise
+
+
+def _enhance_via_batch(products: list[dict]) -> list[dict]:
+    if not USE_LLM_SENTIMENT:
+        summarize_ratings(products)
+        titles = [p["title"] for p in products]
+        categories, misses = _known_categories(titles)
+        shards = list(_chunks(misses, SHARD_SIZE))
+        texts = _batch_texts(
+            _CATEGORIZE_SYSTEM,
+            [_dumps([titles[i] for i in shard]) for shard in shards],
+            [_token_budget(len(shard), *_CATEGORIZE_TOKENS) for shard in shards],
+        )
+        fresh = [
+            cat for shard, raw in zip(shards, texts) for cat in _parse_categories(raw, len(shard))
+        ]
+        _apply_categories(products, categories, misses, fresh)
+        return products
+
+    categories, sentiments, misses = _split_known(products)
+    shards = list(_chunks(misses, SHARD_SIZE))
+    texts = _batch_texts(
+        _FUSED_SYSTEM,
+        [_dumps([_rating_entry(products[i]) for i in shard]) for shard in shards],
+        [_token_budget(len(shard), *_FUSED_TOKENS) for shard in shards],
+    )
+    fresh = [pair for shard, raw in zip(shards, texts) for pair in _parse_fused(raw, len(shard))]
+    _apply_fused(products, categories, sentiments, misses, fresh)
     return products
 
 
 # ── Enhancement 3: Dynamic selector recovery ────────────────────────────────
 
+# Elements whose content carries no selector signal, only prompt tokens
+_SKIP_TAGS = {"script", "style", "noscript", "svg", "template", "iframe"}
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "wbr"}
+_MAX_ATTR_CHARS = 60
+_MAX_TEXT_CHARS = 80
+
+
+class _SkeletonParser(HTMLParser):
+    """
+    Re-emits HTML as tags with only id/class/data-* attributes and collapsed text.
+    With structure_only, just tags and classes: no text and no id/data-* values,
+    which on Amazon differ per listing and per page load (data-asin, data-uuid).
+    """
+
+    def __init__(self, structure_only: bool = False) -> None:
+        super().__init__(convert_charrefs=True)
+        self.structure_only = structure_only
+        self.parts: list[str] = []
+        self._skipping: str | None = None
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self._skipping:
+            self._skip_depth += tag == self._skipping
+            return
+        if tag in _SKIP_TAGS:
+            self._skipping, self._skip_depth = tag, 1
+            return
+
+        kept = "".join(
+            f' {name}="{(value or "")[:_MAX_ATTR_CHARS]}"'
+            for name, value in attrs
+            if name == "class"
+            or (not self.structure_only and (name == "id" or name.startswith("data-")))
+        )
+        self.parts.append(f"<{tag}{kept}>")
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._skipping:
+            if tag == self._skipping:
+                self._skip_depth -= 1
+                if not self._skip_depth:
+                    self._skipping = None
+            return
+        if tag not in _VOID_TAGS:
+            self.parts.append(f"</{tag}>")
+
+    def handle_data(self, data: str) -> None:
+        if self.structure_only or self._skipping:
+            return
+        text = " ".join(data.split())
+        if text:
+            self.parts.append(text[:_MAX_TEXT_CHARS])
+
+
+def _distill_html(snippet: str, structure_only: bool = False) -> str:
+    """
+    Reduce page HTML to its selector-relevant skeleton, so the prompt's character
+    budget holds structure instead of scripts, styles, SVG paths and base64 images.
+    """
+    parser = _SkeletonParser(structure_only)
+    parser.feed(snippet)
+    parser.close()
+    return "".join(parser.parts)
+
+
+def _selector_key(broken_selector: str, html_snippet: str) -> str:
+    """Cache key: the broken selector plus a hash of the page's tag + class skeleton."""
+    skeleton = _distill_html(html_snippet, structure_only=True)
+    structure = hashlib.blake2b(skeleton.encode(), digest_size=16).hexdigest()
+    return json.dumps([broken_selector, structure])
+
 
 def suggest_selector(broken_selector: str, html_snippet: str) -> str:
     """
     Given a broken CSS/XPath selector and a snippet of the page HTML,
-    ask the LLM to suggest a corrected selector.
+    ask the LLM to suggest a corrected selector. Pages with the same structure
+    (ignoring text) reuse the suggestion cached for that broken selector.
     """
+    key = _selector_key(broken_selector, html_snippet)
+    if cached := cache.load(SELECTOR_CACHE).get(key):
+        return cached
+
     system = (
         "You are an expert web scraping assistant. "
         "Given a broken CSS or XPath selector and an HTML snippet, "
         'return a JSON object: {"selector": "<corrected selector>"}. '
         "No explanation, just the corrected selector."
     )
-    user = f"Broken selector: {broken_selector}\n\nHTML snippet:\n{html_snippet[:6000]}"
+    html = _distill_html(html_snippet)[:6000]
+    user = f"Broken selector: {broken_selector}\n\nHTML snippet:\n{html}"
     raw = _chat(system, user, max_tokens=100)
 
     try:
-        return json.loads(raw)["selector"]
+        selector = _loads(raw)["selector"]
     except (json.JSONDecodeError, KeyError):
         return raw
 
+    if _answer(selector) and selector != broken_selector:
+        cache.update(SELECTOR_CACHE, {key: selector})
+    return selector
+
+
+def forget_selector(selector: str) -> None:
+    """Evict a cached suggestion that failed on retry, so the next recovery asks the LLM again."""
+    cache.remove(
+        SELECTOR_CACHE, [k for k, v in cache.load(SELECTOR_CACHE).items() if v == selector]
+    )
+
 
 # ── Public API ───────────────────────────────────────────────────────────────
 
 
+def _skip_enhancements(products: list[dict]) -> list[dict]:
+    print("[WARNING] OPENAI_API_KEY not set. Skipping AI enhancements—returning raw data.")
+    _assign(products, "ai_category", repeat("unknown (no API key)"))
+    _assign(products, "ai_sentiment", repeat("unavailable (no API key)"))
+    return products
+
+
 def enhance_products(products: list[dict]) -> list[dict]:
     """
     Run all AI enhancements on the product list.
-    Gracefully degrades: if the API key is missing or a call fails,
-    the original data is returned with a warning.
+    Gracefully degrades: if the API key is missing the original data is returned
+    with a warning, and a failed call only defaults the fields it was asked to fill.
     """
     if not OPENAI_API_KEY:
-        print("[WARNING] OPENAI_API_KEY not set. Skipping AI enhancements—returning raw data.")
-        for p in products:
-            p["ai_category"] = "unknown (no API key)"
-            p["ai_sentiment"] = "unavailable (no API key)"
-        return products
+        return _skip_enhancements(products)
 
     try:
-        products = categorize_products(products)
-        print("AI categorization complete.")
+        if USE_LLM_SENTIMENT:
+            products = enhance_products_fused(products)
+        else:
+            # Sentiment is local and instant; only categories may need the LLM
+            products = categorize_products(summarize_ratings(products))
+        print("AI categorization and sentiment analysis complete.")
     except Exception as exc:
-        print(f"[WARNING] Categorization failed: {exc}")
+        print(f"[WARNING] AI enhancement failed: {exc}")
+
+    return products
+
+
+def enhance_products_batch(products: list[dict]) -> list[dict]:
+    """
+    Same enhancements as enhance_products, submitted through the OpenAI Batch API.
+    Half the token cost and a separate rate-limit pool, but blocks until the
+    batch finishes (up to the 24h completion window) — meant for large runs.
+    Degrades the same way as enhance_products.
+    """
+    if not OPENAI_API_KEY:
+        return _skip_enhancements(products)
 
     try:
-        products = summarize_ratings(products)
-        print("AI sentiment analysis complete.")
+        products = _enhance_via_batch(products)
+        print("AI batch enhancement complete.")
     except Exception as exc:
-        print(f"[WARNING] Sentiment analysis failed: {exc}")
+        print(f"[WARNING] AI batch enhancement failed: {exc}")
 
     return products
@@ -0,0 +1,11 @@
+"""
+fastjson.py - Optional orjson import shared by the modules that emit JSON.
+
+orjson is a C-accelerated JSON library; when it is not installed, `orjson` is
+None and callers fall back to the stdlib json module.
+"""
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
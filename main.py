@@ -6,15 +6,43 @@ Usage:
     python main.py                        # default: search "laptops"
     python main.py --query="headphones"   # custom search term
     python main.py --query="monitors" --max=10
+    python main.py --max=200 --async-batch     # bulk run via the OpenAI Batch API
 """
 
 import argparse
+import codecs
 import json
+import sys
 
-from enhancer import enhance_products
+from enhancer import enhance_products, enhance_products_batch
+from fastjson import orjson
 from scraper import scrape_products
 
 
+def _stdout_is_utf8() -> bool:
+    try:
+        return codecs.lookup(getattr(sys.stdout, "encoding", None) or "").name == "utf-8"
+    except LookupError:
+        return False
+
+
+def _print_json(data: list[dict]) -> None:
+    """
+    Pretty-print data as JSON without building the indented string in Python.
+    Non-ASCII text is written as-is on a UTF-8 stdout and \\u-escaped otherwise,
+    with or without orjson.
+    """
+    utf8 = _stdout_is_utf8()
+    buffer = getattr(sys.stdout, "buffer", None)
+    if orjson and buffer and utf8:
+        sys.stdout.flush()  # text already printed must come out first
+        buffer.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE))
+        buffer.flush()
+    else:
+        json.dump(data, sys.stdout, indent=2, ensure_ascii=not utf8)
+        sys.stdout.write("\n")
+
+
 def main() -> None:
     parser = argparse.ArgumentParser(
         description="Scrape products from Amazon (or fallback) and enhance with AI."
@@ -29,6 +57,11 @@ def main() -> None:
         dest="max_products",
         help="Maximum number of products to scrape (default: 5)",
     )
+    parser.add_argument(
+        "--async-batch",
+        action="store_true",
+        help="Enhance via the OpenAI Batch API: half the cost, but may take hours",
+    )
     args = parser.parse_args()
 
     # Part 1: Scrape
@@ -41,18 +74,21 @@ def main() -> None:
     print(f"\n{'=' * 60}")
     print("RAW SCRAPED DATA")
     print("=" * 60)
-    print(json.dumps(products, indent=2))
+    _print_json(products)
 
     # Part 2: AI Enhancement
     print(f"\n{'=' * 60}")
     print("ENHANCING WITH AI...")
     print("=" * 60)
-    enhanced = enhance_products(products)
+    if args.async_batch:
+        enhanced = enhance_products_batch(products)
+    else:
+        enhanced = enhance_products(products)
 
     print(f"\n{'=' * 60}")
     print("ENHANCED DATA")
     print("=" * 60)
-    print(json.dumps(enhanced, indent=2))
+    _print_json(enhanced)
 
 
 if __name__ == "__main__":
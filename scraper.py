@@ -7,11 +7,15 @@ Falls back to fakestoreapi.com/products if Amazon blocks after 2 attempts.
 
 import json
 import re
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urljoin
 
 import requests
 from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import (
+    JavascriptException,
+    TimeoutException,
+    WebDriverException,
+)
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
@@ -19,7 +23,57 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # optional C-backed HTML parser; without it Amazon always goes through Selenium
+    LexborHTMLParser = None
+
+AMAZON_URL = "https://www.amazon.com"
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
+)
+_FAST_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# Scraping reads the DOM only, so images, fonts and styles are wasted bytes
+_BLOCKED_CONTENT = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.stylesheets": 2,
+}
+_BLOCKED_URLS = ["*.png", "*.jpg", "*.jpeg", "*.webp", "*.gif", "*.svg", "*.woff*", "*.css"]
+
 CARD_SELECTOR = "[data-component-type='s-search-result']"
+LINK_SELECTOR = "h2 a.a-link-normal"
+PRICE_SELECTOR = "span.a-price > span.a-offscreen"
+RATING_SELECTOR = "span.a-icon-alt"
+
+# Locator tuples for per-card WebElement lookups, built once
+_SEL_LINK = (By.CSS_SELECTOR, LINK_SELECTOR)
+_SEL_PRICE = (By.CSS_SELECTOR, PRICE_SELECTOR)
+_SEL_RATING = (By.CSS_SELECTOR, RATING_SELECTOR)
+
+# Reads every card's fields in one WebDriver round-trip instead of 3-4 per card.
+# arguments: [card, max cards, link, price, rating selectors]. textContent also covers the visually
+# hidden price span, which WebElement.text reports as empty.
+_EXTRACT_CARDS_JS = """
+const [cardSel, limit, linkSel, priceSel, ratingSel] = arguments;
+const text = el => (el ? el.textContent.replace(/\\s+/g, " ").trim() : "");
+return Array.from(document.querySelectorAll(cardSel))
+  .slice(0, limit)
+  .map(card => {
+    const link = card.querySelector(linkSel);
+    return {
+      title: text(link),
+      url: link ? link.href : "",
+      price: text(card.querySelector(priceSel)),
+      rating: text(card.querySelector(ratingSel)),
+    };
+  });
+"""
 
 
 def create_driver() -> webdriver.Chrome:
@@ -29,13 +83,20 @@ def create_driver() -> webdriver.Chrome:
     opts.add_argument("--no-sandbox")
     opts.add_argument("--disable-dev-shm-usage")
     opts.add_argument("--disable-blink-features=AutomationControlled")
-    opts.add_argument(
-        "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-        "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
-    )
+    opts.add_argument(f"user-agent={USER_AGENT}")
+    opts.add_experimental_option("prefs", _BLOCKED_CONTENT)
     # Auto-download matching ChromeDriver via webdriver-manager
     service = Service(ChromeDriverManager().install())
-    return webdriver.Chrome(service=service, options=opts)
+    driver = webdriver.Chrome(service=service, options=opts)
+
+    # Prefs miss CSS-referenced images and web fonts; block those at the network layer
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": _BLOCKED_URLS})
+    except BaseException:
+        driver.quit()  # the caller never gets this driver, so nothing else would
+        raise
+    return driver
 
 
 def _try_ai_selector(driver, broken_selector: str) -> str | None:
@@ -53,6 +114,71 @@ def _try_ai_selector(driver, broken_selector: str) -> str | None:
     return None
 
 
+def _forget_ai_selector(selector: str) -> None:
+    """Drop a suggested selector whose retry failed, so a cached bad answer isn't reused."""
+    try:
+        from enhancer import forget_selector
+
+        forget_selector(selector)
+    except Exception as exc:
+        print(f"[AI Recovery] Could not forget selector: {exc}")
+
+
+def _search_url(query: str) -> str:
+    return f"{AMAZON_URL}/s?k={quote_plus(query)}"
+
+
+def _node_record(card) -> dict:
+    """Same fields as _EXTRACT_CARDS_JS returns, read from a parsed (static) HTML card."""
+
+    def text(node) -> str:
+        return " ".join(node.text().split()) if node else ""
+
+    link = card.css_first(LINK_SELECTOR)
+    return {
+        "title": text(link),
+        "url": urljoin(AMAZON_URL, link.attributes.get("href") or "") if link else "",
+        "price": text(card.css_first(PRICE_SELECTOR)),
+        "rating": text(card.css_first(RATING_SELECTOR)),
+    }
+
+
+def scrape_amazon_fast(query: str, max_products: int = 5) -> list[dict] | None:
+    """
+    Scrape Amazon search results from the server-rendered HTML of a plain GET, no browser.
+    Returns None if the page yields no products (blocked, captcha, changed layout)
+    or selectolax is not installed, so the caller can fall back to Selenium.
+    """
+    if LexborHTMLParser is None:
+        return None
+
+    try:
+        resp = requests.get(_search_url(query), headers=_FAST_HEADERS, timeout=10)
+        resp.raise_for_status()
+    except requests.RequestException as exc:
+        print(f"[Fast path] Amazon request failed: {exc}")
+        return None
+
+    cards = LexborHTMLParser(resp.text).css(CARD_SELECTOR)[:max_products]
+    products = [p for card in cards if (p := _product_from_record(_node_record(card)))]
+    return products or None
+
+
+def _start_driver() -> webdriver.Chrome | None:
+    try:
+        return create_driver()
+    except WebDriverException as exc:
+        print(f"[Amazon] Could not start Chrome: {exc}")
+        return None
+
+
+def _quit_quietly(driver) -> None:
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass  # a crashed browser may already be gone
+
+
 def scrape_amazon(query: str, max_products: int = 5) -> list[dict] | None:
     """
     Attempt to scrape Amazon search results via Selenium.
@@ -60,68 +186,117 @@ def scrape_amazon(query: str, max_products: int = 5) -> list[dict] | None:
     Retries up to 2 times as required by the spec.
     On the second attempt, uses AI selector recovery if the default selector fails.
     """
-    url = f"https://www.amazon.com/s?k={quote_plus(query)}"
+    url = _search_url(query)
     selector = CARD_SELECTOR
 
-    for attempt in range(1, 3):  # 2 attempts
-        driver = None
-        try:
-            driver = create_driver()
-            driver.get(url)
-
-            # Wait for product cards to appear
-            WebDriverWait(driver, 12).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-            )
-
-            cards = driver.find_elements(By.CSS_SELECTOR, selector)[:max_products]
-
-            if not cards:
-                raise TimeoutException("No product cards found")
-
-            products = []
-            for card in cards:
-                product = _parse_amazon_card(card)
-                if product:
-                    products.append(product)
-
-            if products:
-                return products
+    # One browser for both attempts; a retry only clears cookies and reloads,
+    # unless the browser itself failed, in which case it gets a fresh one
+    driver = _start_driver()
+    if driver is None:
+        return None
 
-        except (TimeoutException, WebDriverException) as exc:
-            print(f"[Attempt {attempt}/2] Amazon scrape failed: {exc}")
-            # After first failure, try AI-suggested selector for second attempt
-            if attempt == 1 and driver:
+    try:
+        for attempt in range(1, 3):  # 2 attempts
+            try:
+                driver.delete_all_cookies()
+                driver.get(url)
+
+                # Wait for product cards to appear
+                WebDriverWait(driver, 12).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
+                )
+
+                parsed = _extract_products(driver, selector, max_products)
+
+                if not parsed:
+                    raise TimeoutException("No product cards found")
+
+                products = [product for product in parsed if product]
+                if products:
+                    return products
+
+            except (TimeoutException, WebDriverException) as exc:
+                print(f"[Attempt {attempt}/2] Amazon scrape failed: {exc}")
+                if attempt == 2:
+                    break
+                if not isinstance(exc, TimeoutException):
+                    # Session-level failure (crash, lost session): the selector isn't at fault
+                    _quit_quietly(driver)
+                    driver = _start_driver()
+                    if driver is None:
+                        return None
+                    continue
+                # After first failure, try AI-suggested selector for second attempt
                 ai_selector = _try_ai_selector(driver, selector)
                 if ai_selector:
                     selector = ai_selector
-        finally:
-            if driver:
-                driver.quit()
+
+        if selector != CARD_SELECTOR:
+            _forget_ai_selector(selector)
+    finally:
+        if driver is not None:
+            _quit_quietly(driver)
 
     return None  # Both attempts failed
 
 
+def _extract_products(driver, selector: str, max_products: int) -> list[dict | None]:
+    """
+    Parse up to max_products result cards, one entry per card (None if unparseable).
+    Falls back to per-card WebDriver lookups if the extraction script fails.
+    """
+    try:
+        records = driver.execute_script(
+            _EXTRACT_CARDS_JS,
+            selector,
+            max_products,
+            LINK_SELECTOR,
+            PRICE_SELECTOR,
+            RATING_SELECTOR,
+        )
+    except JavascriptException:
+        cards = driver.find_elements(By.CSS_SELECTOR, selector)[:max_products]
+        return [_parse_amazon_card(card) for card in cards]
+
+    return [_product_from_record(record) for record in records or []]
+
+
+def _parse_rating(text: str | None) -> float | None:
+    """First decimal number in the rating text (e.g. "4.5 out of 5 stars" → 4.5)."""
+    match = re.search(r"(\d+\.?\d*)", text) if text else None
+    return float(match.group(1)) if match else None
+
+
+def _product_from_record(record: dict) -> dict | None:
+    """Build a product dict from one card record returned by _EXTRACT_CARDS_JS."""
+    if not record.get("title"):
+        return None
+    return {
+        "title": record["title"],
+        "price": record.get("price") or None,
+        "rating": _parse_rating(record.get("rating")),
+        "url": record.get("url") or "",
+    }
+
+
 def _parse_amazon_card(card) -> dict | None:
     """Extract title, price, rating, and URL from a single Amazon result card."""
     try:
         # Title + URL
-        link_el = card.find_element(By.CSS_SELECTOR, "h2 a.a-link-normal")
+        link_el = card.find_element(*_SEL_LINK)
         title = link_el.text.strip()
         url = link_el.get_attribute("href") or ""
 
         # Price (may not exist for every listing)
         try:
-            price_el = card.find_element(By.CSS_SELECTOR, "span.a-price > span.a-offscreen")
+            price_el = card.find_element(*_SEL_PRICE)
             price = price_el.text.strip()
         except Exception:
             price = None
 
-        # Rating — extract first decimal number (e.g. "4.5 out of 5 stars" → 4.5)
+        # Rating
         try:
-            rating_text = card.find_element(By.CSS_SELECTOR, "span.a-icon-alt").text
-            match = re.search(r"(\d+\.?\d*)", rating_text) if rating_text else None
-            rating = float(match.group(1)) if match else None
+            rating = _parse_rating(card.find_element(*_SEL_RATING).text)
         except (ValueError, Exception):
             rating = None
 
@@ -155,10 +330,17 @@ def scrape_fakestoreapi(max_products: int = 5) -> list[dict]:
 
 def scrape_products(query: str = "laptops", max_products: int = 5) -> list[dict]:
     """
-    Main entry point: try Amazon via Selenium, fall back to fakestoreapi.
+    Main entry point: try Amazon with a plain HTTP request, then via Selenium,
+    then fall back to fakestoreapi.
     Returns a list of product dicts with title, price, rating, url.
     """
     print(f"Attempting to scrape Amazon for '{query}'...")
+    products = scrape_amazon_fast(query, max_products)
+    if products:
+        print(f"Successfully scraped {len(products)} products from Amazon (no browser needed).")
+        return products
+
+    print("No products in the static page. Retrying with Selenium...")
     products = scrape_amazon(query, max_products)
 
     if products:
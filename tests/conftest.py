@@ -1,25 +1,94 @@
-from unittest.mock import MagicMock
+import json
+import os
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import Mock
 
 import pytest
+from selenium.common.exceptions import NoSuchElementException
 
+import cache
+from scraper import LINK_SELECTOR, PRICE_SELECTOR, RATING_SELECTOR
 
-@pytest.fixture
+# Options that read pytest's own .pytest_cache (last-failed, new-first, stepwise)
+_CACHE_OPTIONS = ("lf", "failedfirst", "newfirst", "stepwise")
+
+
+def pytest_configure(config):
+    """
+    Outside CI, skip writing .pytest_cache after each run unless an option needs it:
+    this suite is pure mocks, so those writes are a noticeable share of a local run.
+    """
+    if os.getenv("CI") or any(config.getoption(name, default=False) for name in _CACHE_OPTIONS):
+        return
+    # cacheprovider is already configured by now (it runs tryfirst), so blocking it
+    # would be too late; drop the two plugins that write at session end instead.
+    for name in ("lfplugin", "nfplugin"):
+        if plugin := config.pluginmanager.get_plugin(name):
+            config.pluginmanager.unregister(plugin)
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Point the persistent result cache at a per-test temp dir, starting empty."""
+    monkeypatch.setattr(cache, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(cache, "_stores", {})
+    monkeypatch.setattr(cache, "_vectors", {})
+    monkeypatch.setattr(cache, "_index", {})
+    return tmp_path / "cache"
+
+
+@pytest.fixture(scope="session")
 def sample_products():
-    """Reusable list of product dicts matching the scraper output schema."""
-    return [
-        {
-            "title": "Gaming Laptop 15.6 inch",
-            "price": "$999.99",
-            "rating": 4.5,
-            "url": "https://example.com/product/1",
-        },
-        {
-            "title": "Budget Wireless Mouse",
-            "price": "$12.99",
-            "rating": 3.8,
-            "url": "https://example.com/product/2",
-        },
-    ]
+    """
+    Product dicts matching the scraper output schema, shared read-only by every test.
+    Tests that mutate products work on a copy: [dict(p) for p in sample_products].
+    """
+    return (
+        MappingProxyType(
+            {
+                "title": "Gaming Laptop 15.6 inch",
+                "price": "$999.99",
+                "rating": 4.5,
+                "url": "https://example.com/product/1",
+            }
+        ),
+        MappingProxyType(
+            {
+                "title": "Budget Wireless Mouse",
+                "price": "$12.99",
+                "rating": 3.8,
+                "url": "https://example.com/product/2",
+            }
+        ),
+    )
+
+
+@pytest.fixture(scope="session")
+def make_card():
+    """Factory for mock Amazon result cards that answer _parse_amazon_card's lookups."""
+
+    def _make(
+        title="Test Product",
+        price="$29.99",
+        rating="4.2 out of 5",
+        url="https://amazon.com/p",
+    ):
+        """Pass None for title, price or rating to build a card without that element."""
+        texts = {LINK_SELECTOR: title, PRICE_SELECTOR: price, RATING_SELECTOR: rating}
+        elements = {
+            selector: SimpleNamespace(text=text, get_attribute=lambda name: url)
+            for selector, text in texts.items()
+            if text is not None
+        }
+
+        def find_element(by, selector):
+            if selector not in elements:
+                raise NoSuchElementException(selector)
+            return elements[selector]
+
+        return SimpleNamespace(find_element=find_element)
+
+    return _make
 
 
 @pytest.fixture
@@ -27,10 +96,7 @@ def mock_openai_response():
     """Factory fixture that creates a mock requests.Response for OpenAI Responses API calls."""
 
     def _make(content: str, status_code: int = 200):
-        resp = MagicMock()
-        resp.status_code = status_code
-        resp.raise_for_status.return_value = None
-        resp.json.return_value = {
+        payload = {
             "output": [
                 {
                     "content": [{"type": "output_text", "text": content}],
@@ -38,6 +104,11 @@ def mock_openai_response():
                 }
             ]
         }
-        return resp
+        return Mock(
+            status_code=status_code,
+            headers={},
+            raise_for_status=Mock(return_value=None),
+            content=json.dumps(payload).encode(),
+        )
 
     return _make
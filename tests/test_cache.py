@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+import cache
+
+TITLE = "Dell XPS 13 9340 Laptop, 13.4 inch FHD+, Intel Core Ultra 7"
+RELISTED = "Dell XPS 13 9340 Laptop - 13.4 inch FHD+, Intel Core Ultra 7"
+
+
+# ── similarity ───────────────────────────────────────────────────────────────
+
+
+class TestSimilarity:
+    def test_ignores_case_and_whitespace(self):
+        assert cache.similarity("Dell XPS 13", "dell   xps 13") == pytest.approx(1.0)
+
+    def test_near_duplicate_above_threshold(self):
+        assert cache.similarity(TITLE, RELISTED) >= cache.SIMILARITY_THRESHOLD
+
+    def test_different_model_below_threshold(self):
+        score = cache.similarity("Dell XPS 13 Laptop 16GB", "Dell XPS 13 Laptop 32GB")
+        assert score < cache.SIMILARITY_THRESHOLD
+
+    def test_empty_string(self):
+        assert cache.similarity("", "anything") == 0.0
+
+
+# ── load / update / lookup ───────────────────────────────────────────────────
+
+
+class TestPersistence:
+    def test_update_writes_json(self, isolated_cache):
+        cache.update("categories", {TITLE: "professional"})
+        on_disk = json.loads((isolated_cache / "categories.json").read_text())
+        assert on_disk == {TITLE: "professional"}
+
+    def test_load_reads_existing_file(self, isolated_cache):
+        isolated_cache.mkdir()
+        (isolated_cache / "categories.json").write_text(json.dumps({TITLE: "gaming"}))
+        assert cache.load("categories") == {TITLE: "gaming"}
+
+    def test_corrupt_file_starts_empty(self, isolated_cache):
+        isolated_cache.mkdir()
+        (isolated_cache / "categories.json").write_text("{not json")
+        assert cache.load("categories") == {}
+
+    def test_lookup_exact_and_similar(self):
+        cache.update("categories", {TITLE: "professional"})
+        assert cache.lookup("categories", TITLE) == "professional"
+        assert cache.lookup("categories", RELISTED) == "professional"
+        assert cache.lookup("categories", "Logitech MX Master 3S Mouse") is None
+
+    def test_split_exact_ignores_near_duplicates(self):
+        cache.update("categories", {TITLE: "professional"})
+        hits, misses = cache.split_exact("categories", [RELISTED, TITLE])
+        assert hits == {1: "professional"}
+        assert misses == [0]
+
+    def test_split_by_similarity(self):
+        cache.update("categories", {TITLE: "professional"})
+        hits, misses = cache.split_by_similarity("categories", ["New Thing", RELISTED])
+        assert hits == {1: "professional"}
+        assert misses == [0]
+
+    def test_oldest_entries_evicted_past_cap(self, monkeypatch):
+        monkeypatch.setattr(cache, "MAX_ENTRIES", 2)
+        cache.update("categories", {TITLE: "professional", "Logitech MX Master 3S": "general"})
+        cache.lookup("categories", "build the index")
+        cache.update("categories", {"Razer Blade 16 Gaming Laptop": "gaming"})
+
+        assert list(cache.load("categories")) == [
+            "Logitech MX Master 3S",
+            "Razer Blade 16 Gaming Laptop",
+        ]
+        assert cache.lookup("categories", RELISTED) is None  # evicted key left the index too
+
+    def test_similarity_search_skips_unrelated_keys(self):
+        cache.update("categories", {f"Acme Widget {i:05d}": "general" for i in range(500)})
+        cache.update("categories", {TITLE: "professional"})
+        store = cache.load("categories")
+        vec, _ = cache._embed(RELISTED)
+
+        assert cache._candidates("categories", store, vec, cache.SIMILARITY_THRESHOLD) == {TITLE}
+        assert cache.lookup("categories", RELISTED) == "professional"
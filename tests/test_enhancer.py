@@ -1,22 +1,37 @@
-import copy
-from unittest.mock import MagicMock, patch
+import json
+from unittest.mock import Mock, patch
 
 import requests
 
+import cache
+import enhancer
 from enhancer import (
+    CATEGORIES,
+    MAX_ATTEMPTS,
     _chat,
+    _distill_html,
+    _parse_duration,
     categorize_products,
     enhance_products,
+    enhance_products_batch,
+    forget_selector,
     suggest_selector,
     summarize_ratings,
 )
 
+
+def _user_prompt(post_kwargs):
+    """Decode the JSON user prompt from a mocked _SESSION.post call's request body."""
+    body = json.loads(post_kwargs["data"])
+    return json.loads(body["input"][1]["content"])
+
+
 # ── _chat ────────────────────────────────────────────────────────────────────
 
 
 class TestChat:
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
+    @patch("enhancer._SESSION.post")
     def test_success(self, mock_post, mock_openai_response):
         mock_post.return_value = mock_openai_response("Hello from AI")
         result = _chat("system prompt", "user prompt")
@@ -25,6 +40,20 @@ class TestChat:
         call_kwargs = mock_post.call_args
         assert "Bearer sk-test-key" in str(call_kwargs)
 
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer.orjson", None)
+    @patch("enhancer._SESSION.post")
+    def test_stdlib_json_fallback(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"categories": ["gaming"]}')
+        result = categorize_products([{"title": "Some Laptop"}])
+        assert result[0]["ai_category"] == "gaming"
+        assert _user_prompt(mock_post.call_args.kwargs) == ["Some Laptop"]
+
+    def test_pool_matches_shard_concurrency(self):
+        adapter = enhancer._SESSION.get_adapter(enhancer.OPENAI_URL)
+        assert adapter._pool_maxsize == enhancer.MAX_CONCURRENCY
+        assert adapter._pool_block is True
+
     @patch("enhancer.OPENAI_API_KEY", "")
     def test_no_api_key_raises(self):
         try:
@@ -34,54 +63,246 @@ class TestChat:
             assert "OPENAI_API_KEY" in str(e)
 
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
+    @patch("enhancer._SESSION.post")
     def test_http_error(self, mock_post):
-        mock_resp = MagicMock()
-        mock_resp.raise_for_status.side_effect = requests.HTTPError("401 Unauthorized")
-        mock_post.return_value = mock_resp
+        mock_post.return_value = Mock(
+            status_code=401,
+            headers={},
+            raise_for_status=Mock(side_effect=requests.HTTPError("401 Unauthorized")),
+        )
 
         try:
             _chat("system", "user")
             assert False, "Should have raised HTTPError"
         except requests.HTTPError:
             pass
+        mock_post.assert_called_once()  # client errors are not retried
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer.time.sleep")
+    @patch("enhancer._SESSION.post")
+    def test_retries_rate_limit_then_succeeds(self, mock_post, mock_sleep, mock_openai_response):
+        throttled = mock_openai_response("", status_code=429)
+        throttled.headers = {"Retry-After": "7"}
+        mock_post.side_effect = [throttled, mock_openai_response("ok")]
+
+        assert _chat("system", "user") == "ok"
+        assert mock_post.call_count == 2
+        assert mock_sleep.call_args.args[0] >= 7
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer.time.sleep")
+    @patch("enhancer._SESSION.post")
+    def test_gives_up_after_max_attempts(self, mock_post, mock_sleep, mock_openai_response):
+        unavailable = mock_openai_response("", status_code=503)
+        unavailable.raise_for_status.side_effect = requests.HTTPError("503 Service Unavailable")
+        mock_post.return_value = unavailable
+
+        try:
+            _chat("system", "user")
+            assert False, "Should have raised HTTPError"
+        except requests.HTTPError:
+            pass
+        assert mock_post.call_count == MAX_ATTEMPTS
+        assert mock_sleep.call_count == MAX_ATTEMPTS - 1
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._paused_until", 0.0)
+    @patch("enhancer.time.sleep")
+    @patch("enhancer._SESSION.post")
+    def test_exhausted_budget_paces_next_call(self, mock_post, mock_sleep, mock_openai_response):
+        last = mock_openai_response("ok")
+        last.headers = {
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-reset-requests": "2s",
+        }
+        mock_post.return_value = last
+
+        _chat("system", "user")
+        mock_sleep.assert_not_called()
+        _chat("system", "user")
+        assert 0 < mock_sleep.call_args.args[0] <= 2
+
+
+class TestParseDuration:
+    def test_formats(self):
+        assert _parse_duration("2") == 2.0
+        assert _parse_duration("20ms") == 0.02
+        assert _parse_duration("1.5s") == 1.5
+        assert _parse_duration("6m0s") == 360.0
+        assert _parse_duration(None) is None
+        assert _parse_duration("Wed, 21 Oct 2015 07:28:00 GMT") is None
 
 
 # ── categorize_products ──────────────────────────────────────────────────────
 
 
+def _numbered_categories(titles):
+    """Categories that cycle with each "Item <n>" title's number, so tests can check order."""
+    return [CATEGORIES[int(title.split()[1]) % len(CATEGORIES)] for title in titles]
+
+
+def _unruled_products():
+    """Products no keyword rule matches, so categorization has to ask the LLM."""
+    return [
+        {"title": "Apple MacBook Air 13-inch M3", "rating": 4.7},
+        {"title": "Logitech MX Master 3S Mouse", "rating": 4.6},
+    ]
+
+
 class TestCategorizeProducts:
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
-    def test_success(self, mock_post, sample_products, mock_openai_response):
-        products = copy.deepcopy(sample_products)
-        mock_post.return_value = mock_openai_response('{"categories": ["gaming", "budget"]}')
+    @patch("enhancer._SESSION.post")
+    def test_success(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"categories": ["professional", "general"]}')
+
+        result = categorize_products(_unruled_products())
+        assert result[0]["ai_category"] == "professional"
+        assert result[1]["ai_category"] == "general"
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_token_budget_scales_with_shard(self, mock_post, mock_openai_response):
+        mock_post.side_effect = lambda *a, **kw: mock_openai_response('{"categories": []}')
+        products = [{"title": f"Widget model {i}", "rating": 4.0} for i in range(25)]
+
+        categorize_products(products)
+        budgets = sorted(
+            json.loads(c.kwargs["data"])["max_output_tokens"] for c in mock_post.call_args_list
+        )
+        assert budgets == [20 + 8 * 5, 20 + 8 * 20]
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_keyword_rules_skip_llm(self, mock_post, sample_products):
+        products = [dict(p) for p in sample_products]
+        products.append({"title": "Lenovo ThinkPad X1 Carbon", "rating": 4.4})
 
         result = categorize_products(products)
-        assert result[0]["ai_category"] == "gaming"
-        assert result[1]["ai_category"] == "budget"
+        mock_post.assert_not_called()
+        assert [p["ai_category"] for p in result] == ["gaming", "budget", "professional"]
 
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
-    def test_json_parse_error_defaults_to_general(
-        self, mock_post, sample_products, mock_openai_response
-    ):
-        products = copy.deepcopy(sample_products)
+    @patch("enhancer._SESSION.post")
+    def test_json_parse_error_defaults_to_general(self, mock_post, mock_openai_response):
         mock_post.return_value = mock_openai_response("not valid json")
 
-        result = categorize_products(products)
+        result = categorize_products(_unruled_products())
         assert result[0]["ai_category"] == "general"
         assert result[1]["ai_category"] == "general"
 
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_large_list_is_sharded_in_order(self, mock_post, mock_openai_response):
+        products = [{"title": f"Item {i}", "rating": 4.0} for i in range(45)]
+
+        def _echo(url, **kwargs):
+            titles = _user_prompt(kwargs)
+            return mock_openai_response(json.dumps({"categories": _numbered_categories(titles)}))
+
+        mock_post.side_effect = _echo
+
+        result = categorize_products(products)
+        assert mock_post.call_count == 3  # 20 + 20 + 5
+        assert [p["ai_category"] for p in result] == _numbered_categories(
+            p["title"] for p in result
+        )
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_failed_shard_keeps_other_shards(self, mock_post, mock_openai_response, capsys):
+        products = [{"title": f"Item {i}", "rating": 4.0} for i in range(45)]
+
+        def _echo_or_fail(url, **kwargs):
+            titles = _user_prompt(kwargs)
+            if titles[0] == "Item 20":
+                raise requests.HTTPError("503 Service Unavailable")
+            return mock_openai_response(json.dumps({"categories": _numbered_categories(titles)}))
+
+        mock_post.side_effect = _echo_or_fail
+
+        result = categorize_products(products)
+        categories = [p["ai_category"] for p in result]
+        expected = _numbered_categories(p["title"] for p in result)
+        assert categories[:20] == expected[:20]
+        assert categories[20:40] == ["general"] * 20
+        assert categories[40:] == expected[40:]
+        assert len(cache.load("categories")) == 25  # good shards are cached
+        assert "1 of 3 AI requests failed" in capsys.readouterr().out
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_unknown_label_is_not_cached(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"categories": ["Laptops", " Gaming "]}')
+
+        result = categorize_products(_unruled_products())
+        assert [p["ai_category"] for p in result] == ["general", "gaming"]
+        assert cache.load("categories") == {"Logitech MX Master 3S Mouse": "gaming"}
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_short_reply_pads_with_general(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"categories": ["professional"]}')
+
+        result = categorize_products(_unruled_products())
+        assert result[0]["ai_category"] == "professional"
+        assert result[1]["ai_category"] == "general"
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_cached_titles_skip_llm(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"categories": ["professional", "general"]}')
+        categorize_products(_unruled_products())
+
+        products = _unruled_products()
+        products[1]["title"] = "logitech  MX Master 3S mouse"  # near-duplicate of a cached title
+        result = categorize_products(products)
+
+        mock_post.assert_called_once()
+        assert [p["ai_category"] for p in result] == ["professional", "general"]
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_only_misses_are_sent(self, mock_post, mock_openai_response):
+        cache.update("categories", {"Apple MacBook Air 13-inch M3": "professional"})
+        mock_post.return_value = mock_openai_response('{"categories": ["general"]}')
+
+        result = categorize_products(_unruled_products())
+
+        sent = _user_prompt(mock_post.call_args.kwargs)
+        assert sent == ["Logitech MX Master 3S Mouse"]
+        assert [p["ai_category"] for p in result] == ["professional", "general"]
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_defaults_are_not_cached(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response("not valid json")
+        categorize_products(_unruled_products())
+        assert cache.load("categories") == {}
+
 
 # ── summarize_ratings ────────────────────────────────────────────────────────
 
 
 class TestSummarizeRatings:
+    @patch("enhancer._SESSION.post")
+    def test_templated_locally_by_default(self, mock_post, sample_products):
+        products = [dict(p) for p in sample_products]
+        products.append({"title": "Mystery Box", "rating": None})
+
+        result = summarize_ratings(products)
+        mock_post.assert_not_called()
+        assert result[0]["ai_sentiment"] == (
+            "Excellent reviews: Gaming Laptop 15.6 inch is rated 4.5 out of 5."
+        )
+        assert result[1]["ai_sentiment"].startswith("Mixed reviews:")
+        assert result[2]["ai_sentiment"] == "No sentiment available."
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
+    @patch("enhancer._SESSION.post")
     def test_success(self, mock_post, sample_products, mock_openai_response):
-        products = copy.deepcopy(sample_products)
+        products = [dict(p) for p in sample_products]
         sentiments = '{"sentiments": ["Great laptop!", "Decent mouse."]}'
         mock_post.return_value = mock_openai_response(sentiments)
 
@@ -89,29 +310,135 @@ class TestSummarizeRatings:
         assert result[0]["ai_sentiment"] == "Great laptop!"
         assert result[1]["ai_sentiment"] == "Decent mouse."
 
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
+    @patch("enhancer._SESSION.post")
     def test_json_parse_error_defaults(self, mock_post, sample_products, mock_openai_response):
-        products = copy.deepcopy(sample_products)
+        products = [dict(p) for p in sample_products]
         mock_post.return_value = mock_openai_response("invalid json")
 
         result = summarize_ratings(products)
         assert result[0]["ai_sentiment"] == "No sentiment available."
         assert result[1]["ai_sentiment"] == "No sentiment available."
 
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_cache_is_keyed_by_title_and_rating(
+        self, mock_post, sample_products, mock_openai_response
+    ):
+        mock_post.return_value = mock_openai_response(
+            '{"sentiments": ["Great laptop!", "Decent mouse."]}'
+        )
+        summarize_ratings([dict(p) for p in sample_products])
+
+        products = [dict(p) for p in sample_products]
+        products[1]["rating"] = 1.0  # same title, new rating -> must be re-asked
+        mock_post.return_value = mock_openai_response('{"sentiments": ["Poor mouse."]}')
+        result = summarize_ratings(products)
+
+        sent = _user_prompt(mock_post.call_args.kwargs)
+        assert sent == [{"title": "Budget Wireless Mouse", "rating": 1.0}]
+        assert [p["ai_sentiment"] for p in result] == ["Great laptop!", "Poor mouse."]
+
 
 # ── suggest_selector ─────────────────────────────────────────────────────────
 
 
 class TestSuggestSelector:
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
+    @patch("enhancer._SESSION.post")
     def test_returns_selector(self, mock_post, mock_openai_response):
         mock_post.return_value = mock_openai_response('{"selector": "h2.product-title a"}')
         html = "<div><h2 class='product-title'><a>Link</a></h2></div>"
         result = suggest_selector("h2.old a", html)
         assert result == "h2.product-title a"
 
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_sends_distilled_html(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"selector": "h2 a"}')
+        html = "<script>" + "x" * 10_000 + "</script><h2 class='title'><a>Link</a></h2>"
+        suggest_selector("h2.old a", html)
+
+        prompt = json.loads(mock_post.call_args.kwargs["data"])["input"][1]["content"]
+        assert '<h2 class="title"><a>Link</a></h2>' in prompt
+        assert "xxx" not in prompt
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_same_structure_reuses_cached_selector(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"selector": "h2.title a"}')
+        suggest_selector("h2.old a", "<h2 class='title'><a>Dell XPS 13</a></h2>")
+        result = suggest_selector("h2.old a", "<h2 class='title'><a>Acer Aspire 5</a></h2>")
+
+        assert result == "h2.title a"
+        assert mock_post.call_count == 1
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_per_listing_attributes_still_hit_cache(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"selector": "h2.title a"}')
+        card = (
+            "<div class='s-result-item' data-asin='{}' data-uuid='{}'><h2 class='title'></h2></div>"
+        )
+        suggest_selector("h2.old a", card.format("B0AAA", "1f3c"))
+        result = suggest_selector("h2.old a", card.format("B0BBB", "9e7d"))
+
+        assert result == "h2.title a"
+        assert mock_post.call_count == 1
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_forgotten_selector_asks_again(self, mock_post, mock_openai_response):
+        mock_post.side_effect = [
+            mock_openai_response('{"selector": "h2.title a"}'),
+            mock_openai_response('{"selector": "h2.title > a"}'),
+        ]
+        html = "<h2 class='title'><a>Link</a></h2>"
+        forget_selector(suggest_selector("h2.old a", html))
+
+        assert cache.load("selectors") == {}
+        assert suggest_selector("h2.old a", html) == "h2.title > a"
+        assert mock_post.call_count == 2
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_changed_structure_asks_again(self, mock_post, mock_openai_response):
+        mock_post.side_effect = [
+            mock_openai_response('{"selector": "h2.title a"}'),
+            mock_openai_response('{"selector": "h3.name a"}'),
+        ]
+        suggest_selector("h2.old a", "<h2 class='title'><a>Link</a></h2>")
+        result = suggest_selector("h2.old a", "<h3 class='name'><a>Link</a></h3>")
+
+        assert result == "h3.name a"
+        assert mock_post.call_count == 2
+
+
+class TestDistillHTML:
+    def test_strips_noise_keeps_structure(self):
+        html = """
+        <head><style>.a { color: red }</style><script>var s = "<div>";</script></head>
+        <!-- tracking comment -->
+        <div class="s-result-item" style="color:red" data-asin="B0X" onclick="go()">
+          <h2><a class="a-link-normal" href="/dp/1">  Dell   XPS
+             13  </a></h2>
+          <img src="data:image/png;base64,AAAA" class="s-image">
+          <svg><path d="M0 0"/><g><path/></g></svg>
+          <noscript><img src="pixel.gif"></noscript>
+        </div>
+        """
+        assert _distill_html(html) == (
+            '<head></head><div class="s-result-item" data-asin="B0X">'
+            '<h2><a class="a-link-normal">Dell XPS 13</a></h2>'
+            '<img class="s-image"></div>'
+        )
+
+    def test_truncates_long_attribute_values(self):
+        html = f'<div data-state="{"z" * 500}"></div>'
+        assert len(_distill_html(html)) < 100
+
 
 # ── enhance_products ─────────────────────────────────────────────────────────
 
@@ -119,37 +446,265 @@ class TestSuggestSelector:
 class TestEnhanceProducts:
     @patch("enhancer.OPENAI_API_KEY", "")
     def test_no_api_key_graceful_degradation(self, sample_products):
-        products = copy.deepcopy(sample_products)
+        products = [dict(p) for p in sample_products]
         result = enhance_products(products)
         assert result[0]["ai_category"] == "unknown (no API key)"
         assert result[0]["ai_sentiment"] == "unavailable (no API key)"
 
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
+    @patch("enhancer._SESSION.post")
+    def test_default_only_asks_for_categories(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response('{"categories": ["professional", "general"]}')
+
+        result = enhance_products(_unruled_products())
+        mock_post.assert_called_once()
+        assert _user_prompt(mock_post.call_args.kwargs) == [p["title"] for p in _unruled_products()]
+        assert result[0]["ai_category"] == "professional"
+        assert result[0]["ai_sentiment"].startswith("Excellent reviews:")
+
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post", side_effect=requests.HTTPError("API error"))
+    def test_categorization_failure_keeps_sentiment(self, mock_post, capsys):
+        result = enhance_products(_unruled_products())
+        assert result[0]["ai_category"] == "general"
+        assert result[0]["ai_sentiment"].startswith("Excellent reviews:")
+        assert "1 of 1 AI requests failed" in capsys.readouterr().out
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
     def test_full_enhancement(self, mock_post, sample_products, mock_openai_response):
-        products = copy.deepcopy(sample_products)
-        # First call: categorize_products, second call: summarize_ratings
+        products = [dict(p) for p in sample_products]
+        mock_post.return_value = mock_openai_response(
+            '{"items": [{"category": "gaming", "sentiment": "Great laptop!"}, '
+            '{"category": "budget", "sentiment": "Decent mouse."}]}'
+        )
+
+        result = enhance_products(products)
+        mock_post.assert_called_once()  # one fused request, not one per enhancement
+        assert result[0]["ai_category"] == "gaming"
+        assert result[1]["ai_sentiment"] == "Decent mouse."
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_malformed_item_defaults_missing_field(self, mock_post, mock_openai_response):
+        mock_post.return_value = mock_openai_response(
+            '{"items": [{"category": "professional"}, "oops"]}'
+        )
+
+        result = enhance_products(_unruled_products())
+        assert result[0]["ai_category"] == "professional"
+        assert result[0]["ai_sentiment"] == "No sentiment available."
+        assert result[1]["ai_category"] == "general"
+        assert result[1]["ai_sentiment"] == "No sentiment available."
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_failed_fused_shard_defaults_only_its_products(self, mock_post, mock_openai_response):
+        products = [{"title": f"Item {i}", "rating": 4.0} for i in range(25)]
+
+        def _answer_or_fail(url, **kwargs):
+            entries = _user_prompt(kwargs)
+            if len(entries) == 5:
+                raise requests.HTTPError("503 Service Unavailable")
+            items = [{"category": "budget", "sentiment": e["title"]} for e in entries]
+            return mock_openai_response(json.dumps({"items": items}))
+
+        mock_post.side_effect = _answer_or_fail
+
+        result = enhance_products(products)
+        assert result[0]["ai_sentiment"] == "Item 0"
+        assert result[24]["ai_category"] == "general"
+        assert result[24]["ai_sentiment"] == "No sentiment available."
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_rule_category_beats_model_answer(
+        self, mock_post, sample_products, mock_openai_response
+    ):
+        products = [dict(p) for p in sample_products]
+        mock_post.return_value = mock_openai_response(
+            '{"items": [{"category": "general", "sentiment": "Great laptop!"}, '
+            '{"category": "general", "sentiment": "Decent mouse."}]}'
+        )
+
+        result = enhance_products(products)
+        assert [p["ai_category"] for p in result] == ["gaming", "budget"]
+        assert cache.load("categories") == {}  # rule hits are not cached
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_repeat_run_served_from_cache(self, mock_post, sample_products, mock_openai_response):
+        mock_post.return_value = mock_openai_response(
+            '{"items": [{"category": "gaming", "sentiment": "Great laptop!"}, '
+            '{"category": "budget", "sentiment": "Decent mouse."}]}'
+        )
+        enhance_products([dict(p) for p in sample_products])
+
+        result = enhance_products([dict(p) for p in sample_products])
+        mock_post.assert_called_once()
+        assert result[1]["ai_category"] == "budget"
+        assert result[1]["ai_sentiment"] == "Decent mouse."
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post", side_effect=requests.HTTPError("API error"))
+    def test_failure_still_returns(self, mock_post, sample_products, capsys):
+        """If the API call fails, locally known fields are kept and only the rest default."""
+        products = [dict(p) for p in sample_products]
+
+        result = enhance_products(products)
+        assert len(result) == 2
+        assert [p["ai_category"] for p in result] == ["gaming", "budget"]
+        assert result[0]["ai_sentiment"] == "No sentiment available."
+        assert "AI requests failed" in capsys.readouterr().out
+
+
+# ── enhance_products_batch ───────────────────────────────────────────────────
+
+
+def _json_resp(payload, status_code=200):
+    return Mock(
+        status_code=status_code,
+        headers={},
+        raise_for_status=Mock(return_value=None),
+        json=Mock(return_value=payload),
+    )
+
+
+class TestEnhanceProductsBatch:
+    @patch("enhancer.OPENAI_API_KEY", "")
+    def test_no_api_key_graceful_degradation(self, sample_products):
+        products = [dict(p) for p in sample_products]
+        result = enhance_products_batch(products)
+        assert result[0]["ai_category"] == "unknown (no API key)"
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer.time.sleep")
+    @patch("enhancer._SESSION.get")
+    @patch("enhancer._SESSION.post")
+    def test_submit_poll_download(self, mock_post, mock_get, mock_sleep, sample_products):
+        products = [dict(p) for p in sample_products]
+        text = (
+            '{"items": [{"category": "gaming", "sentiment": "Great laptop!"}, '
+            '{"category": "budget", "sentiment": "Decent mouse."}]}'
+        )
+        output_line = {
+            "custom_id": "0",
+            "response": {
+                "status_code": 200,
+                "body": {"output": [{"content": [{"type": "output_text", "text": text}]}]},
+            },
+        }
+        content = Mock(
+            status_code=200,
+            raise_for_status=Mock(return_value=None),
+            text=json.dumps(output_line) + "\n",
+        )
+
         mock_post.side_effect = [
-            mock_openai_response('{"categories": ["gaming", "budget"]}'),
-            mock_openai_response('{"sentiments": ["Great laptop!", "Decent mouse."]}'),
+            _json_resp({"id": "file-in"}),
+            _json_resp({"id": "batch_1", "status": "validating"}),
+        ]
+        mock_get.side_effect = [
+            _json_resp({"id": "batch_1", "status": "in_progress"}),
+            _json_resp({"id": "batch_1", "status": "completed", "output_file_id": "file-out"}),
+            content,
         ]
 
-        result = enhance_products(products)
+        result = enhance_products_batch(products)
+
+        upload, create = mock_post.call_args_list
+        assert upload.kwargs["data"] == {"purpose": "batch"}
+        line = json.loads(upload.kwargs["files"]["file"][1])
+        assert line["url"] == "/v1/responses"
+        assert create.kwargs["json"]["input_file_id"] == "file-in"
+        assert create.kwargs["json"]["completion_window"] == "24h"
+        mock_sleep.assert_called_once()  # one poll while in_progress
+        assert mock_get.call_args.args[0].endswith("/files/file-out/content")
         assert result[0]["ai_category"] == "gaming"
         assert result[1]["ai_sentiment"] == "Decent mouse."
 
     @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
-    @patch("enhancer.requests.post")
-    def test_partial_failure_still_returns(self, mock_post, sample_products, mock_openai_response):
-        """If categorization succeeds but sentiment fails, products still returned."""
-        products = copy.deepcopy(sample_products)
+    @patch("enhancer._SESSION.post")
+    def test_default_mode_needs_no_batch_for_ruled_titles(self, mock_post, sample_products):
+        result = enhance_products_batch([dict(p) for p in sample_products])
+        mock_post.assert_not_called()
+        assert [p["ai_category"] for p in result] == ["gaming", "budget"]
+        assert result[1]["ai_sentiment"].startswith("Mixed reviews:")
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.post")
+    def test_fully_cached_skips_batch(self, mock_post, sample_products):
+        products = [dict(p) for p in sample_products]
+        cache.update("categories", {p["title"]: "general" for p in products})
+        cache.update(
+            "sentiments",
+            {json.dumps([p["title"], p["rating"]]): "Cached." for p in products},
+        )
+
+        result = enhance_products_batch(products)
+        mock_post.assert_not_called()
+        assert result[0]["ai_sentiment"] == "Cached."
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer._SESSION.get")
+    @patch("enhancer._SESSION.post")
+    def test_failed_batch_keeps_local_results(self, mock_post, mock_get, sample_products, capsys):
+        products = [dict(p) for p in sample_products]
         mock_post.side_effect = [
-            mock_openai_response('{"categories": ["gaming", "budget"]}'),
-            requests.HTTPError("API error"),
+            _json_resp({"id": "file-in"}),
+            _json_resp({"id": "batch_1", "status": "validating"}),
         ]
+        mock_get.return_value = _json_resp({"id": "batch_1", "status": "expired"})
 
-        result = enhance_products(products)
-        # Categorization should have been applied
+        result = enhance_products_batch(products)
         assert result[0]["ai_category"] == "gaming"
-        # Products are still returned even though sentiment failed
-        assert len(result) == 2
+        assert result[0]["ai_sentiment"] == "No sentiment available."
+        assert "expired" in capsys.readouterr().out
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer.time.sleep")
+    @patch("enhancer._SESSION.get")
+    @patch("enhancer._SESSION.post")
+    def test_poll_retries_transient_errors(self, mock_post, mock_get, mock_sleep, sample_products):
+        mock_post.side_effect = [
+            _json_resp({"id": "file-in"}),
+            _json_resp({"id": "batch_1", "status": "validating"}),
+        ]
+        mock_get.side_effect = [
+            _json_resp({}, status_code=503),
+            requests.ReadTimeout("read timed out"),
+            _json_resp({"id": "batch_1", "status": "completed"}),
+        ]
+
+        result = enhance_products_batch([dict(p) for p in sample_products])
+        assert mock_get.call_count == 3
+        assert mock_sleep.call_count == 2
+        assert result[0]["ai_sentiment"] == "No sentiment available."
+
+    @patch("enhancer.USE_LLM_SENTIMENT", True)
+    @patch("enhancer.OPENAI_API_KEY", "sk-test-key")
+    @patch("enhancer.time.sleep")
+    @patch("enhancer._SESSION.get", side_effect=requests.ConnectionError("reset"))
+    @patch("enhancer._SESSION.post")
+    def test_lost_batch_prints_its_id(
+        self, mock_post, mock_get, mock_sleep, sample_products, capsys
+    ):
+        mock_post.side_effect = [
+            _json_resp({"id": "file-in"}),
+            _json_resp({"id": "batch_1", "status": "validating"}),
+        ]
+
+        result = enhance_products_batch([dict(p) for p in sample_products])
+        assert mock_get.call_count == MAX_ATTEMPTS
+        assert result[0]["ai_category"] == "gaming"
+        assert "/batches/batch_1" in capsys.readouterr().out
@@ -1,52 +1,113 @@
-from unittest.mock import patch
+import io
+import sys
+from unittest.mock import Mock
+
+import pytest
 
 from main import main
 
 
+@pytest.fixture
+def mock_scrape(monkeypatch):
+    """scrape_products stub that finds nothing unless a test sets return_value."""
+    mock = Mock(return_value=[])
+    monkeypatch.setattr("main.scrape_products", mock)
+    return mock
+
+
+@pytest.fixture
+def mock_enhance(monkeypatch):
+    """enhance_products stub that passes products through unchanged."""
+    mock = Mock(side_effect=lambda p: p)
+    monkeypatch.setattr("main.enhance_products", mock)
+    return mock
+
+
+@pytest.fixture
+def mock_batch(monkeypatch):
+    mock = Mock(side_effect=lambda p: p)
+    monkeypatch.setattr("main.enhance_products_batch", mock)
+    return mock
+
+
 class TestMainCLI:
     """Tests for CLI argument parsing and main() orchestration."""
 
-    @patch("main.enhance_products")
-    @patch("main.scrape_products", return_value=[])
-    def test_no_products_exits_early(self, mock_scrape, mock_enhance, capsys):
+    def test_no_products_exits_early(self, mock_scrape, mock_enhance, capsys, monkeypatch):
         """When scraper returns nothing, enhance should not be called."""
-        with patch("sys.argv", ["main.py"]):
-            main()
+        monkeypatch.setattr(sys, "argv", ["main.py"])
+        main()
         mock_scrape.assert_called_once_with(query="laptops", max_products=5)
         mock_enhance.assert_not_called()
         assert "No products found" in capsys.readouterr().out
 
-    @patch("main.enhance_products")
-    @patch("main.scrape_products", return_value=[])
-    def test_default_args(self, mock_scrape, mock_enhance):
-        """Default query should be 'laptops' with max 5."""
-        with patch("sys.argv", ["main.py"]):
-            main()
-        mock_scrape.assert_called_once_with(query="laptops", max_products=5)
+    @pytest.mark.parametrize(
+        "argv, expected",
+        [
+            pytest.param([], {"query": "laptops", "max_products": 5}, id="defaults"),
+            pytest.param(
+                ["--query=headphones"], {"query": "headphones", "max_products": 5}, id="query"
+            ),
+            pytest.param(["--max=10"], {"query": "laptops", "max_products": 10}, id="max"),
+        ],
+    )
+    def test_args(self, mock_scrape, mock_enhance, monkeypatch, argv, expected):
+        """Defaults are query 'laptops' with max 5; --query and --max override them."""
+        monkeypatch.setattr(sys, "argv", ["main.py", *argv])
+        main()
+        mock_scrape.assert_called_once_with(**expected)
 
-    @patch("main.enhance_products")
-    @patch("main.scrape_products", return_value=[])
-    def test_custom_query(self, mock_scrape, mock_enhance):
-        with patch("sys.argv", ["main.py", "--query=headphones"]):
-            main()
-        mock_scrape.assert_called_once_with(query="headphones", max_products=5)
-
-    @patch("main.enhance_products")
-    @patch("main.scrape_products", return_value=[])
-    def test_custom_max(self, mock_scrape, mock_enhance):
-        with patch("sys.argv", ["main.py", "--max=10"]):
-            main()
-        mock_scrape.assert_called_once_with(query="laptops", max_products=10)
-
-    @patch("main.enhance_products", side_effect=lambda p: p)
-    @patch("main.scrape_products")
-    def test_full_pipeline(self, mock_scrape, mock_enhance, sample_products, capsys):
+    def test_full_pipeline(self, mock_scrape, mock_enhance, sample_products, capsys, monkeypatch):
         """When products are found, both raw and enhanced data should be printed."""
-        mock_scrape.return_value = sample_products
-        with patch("sys.argv", ["main.py"]):
-            main()
+        products = [dict(p) for p in sample_products]
+        mock_scrape.return_value = products
+        monkeypatch.setattr(sys, "argv", ["main.py"])
+        main()
         mock_scrape.assert_called_once()
-        mock_enhance.assert_called_once_with(sample_products)
+        mock_enhance.assert_called_once_with(products)
         output = capsys.readouterr().out
         assert "RAW SCRAPED DATA" in output
         assert "ENHANCED DATA" in output
+        assert output.index("ENHANCED DATA") < output.rindex('"title": "Gaming Laptop 15.6 inch"')
+
+    def test_json_output_without_orjson(
+        self, mock_scrape, mock_enhance, sample_products, capsys, monkeypatch
+    ):
+        monkeypatch.setattr("main.orjson", None)
+        mock_scrape.return_value = [dict(p) for p in sample_products]
+        monkeypatch.setattr(sys, "argv", ["main.py"])
+        main()
+        output = capsys.readouterr().out
+        assert output.count('"title": "Budget Wireless Mouse"') == 2
+
+    def test_async_batch_flag(
+        self, mock_scrape, mock_batch, mock_enhance, sample_products, monkeypatch
+    ):
+        products = [dict(p) for p in sample_products]
+        mock_scrape.return_value = products
+        monkeypatch.setattr(sys, "argv", ["main.py", "--async-batch"])
+        main()
+        mock_batch.assert_called_once_with(products)
+        mock_enhance.assert_not_called()
+
+    @pytest.mark.parametrize("has_orjson", [True, False], ids=["orjson", "stdlib"])
+    def test_non_ascii_title_printed_as_is(
+        self, mock_scrape, mock_enhance, capsys, monkeypatch, has_orjson
+    ):
+        if not has_orjson:
+            monkeypatch.setattr("main.orjson", None)
+        mock_scrape.return_value = [{"title": "Écran 4K — 27\u2033", "rating": 4.5}]
+        monkeypatch.setattr(sys, "argv", ["main.py"])
+        main()
+        assert capsys.readouterr().out.count('"title": "Écran 4K — 27\u2033"') == 2
+
+    def test_non_ascii_title_escaped_on_non_utf8_stdout(
+        self, mock_scrape, mock_enhance, monkeypatch
+    ):
+        stdout = io.TextIOWrapper(io.BytesIO(), encoding="cp1252")
+        monkeypatch.setattr(sys, "stdout", stdout)
+        mock_scrape.return_value = [{"title": "Écran 4K", "rating": 4.5}]
+        monkeypatch.setattr(sys, "argv", ["main.py"])
+        main()
+        stdout.flush()
+        assert stdout.buffer.getvalue().decode("cp1252").count('"title": "\\u00c9cran 4K"') == 2